@@ -1,26 +1,62 @@
+import warnings
 import streamlit as st
 import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from scipy.stats import norm, qmc
 
 class CarbonCreditSimulation:
-    def __init__(self, num_simulations=100000, discount_rate=0.08, time_horizon=30):
+    # Constants
+    CARBON_STOCK = 568  # tCO2/ha
+    ANNUAL_ABSORPTION = 9.5  # tCO2/ha/year
+    
+    def __init__(self, num_simulations=100000, discount_rate=0.08, time_horizon=30,
+                 seed=None):
         self.num_simulations = num_simulations
+        self.rng = np.random.Generator(np.random.SFC64(seed))
         
-        # Constants
-        self.CARBON_STOCK = 568  # tCO2/ha
-        self.ANNUAL_ABSORPTION = 9.5  # tCO2/ha/year
         self.DISCOUNT_RATE = discount_rate
         self.TIME_HORIZON = time_horizon
         
-    def generate_price_scenarios(self, mean_price, std_dev):
-        """Generate price scenarios using normal distribution"""
-        return np.random.normal(mean_price, std_dev, self.num_simulations)
+        # Discount factors are fixed for a given rate and horizon, so compute them once
+        years = np.arange(self.TIME_HORIZON)
+        self._discount_factors = 1 / (1 + self.DISCOUNT_RATE) ** years
+        
+    def generate_price_scenarios(self, mean_prices, std_devs):
+        """Generate price scenarios using normal distribution
+        
+        Scalar mean and std give an array of shape (N,); sequences of k means and stds
+        give shape (N, k), one column per mean/std pair.
+        """
+        scalar = np.ndim(mean_prices) == 0 and np.ndim(std_devs) == 0
+        mean_prices = np.atleast_1d(np.asarray(mean_prices, dtype=np.float32))
+        std_devs = np.atleast_1d(np.asarray(std_devs, dtype=np.float32))
+        
+        # Quasi-Monte Carlo: scrambled Sobol points cover the distribution more evenly
+        # than pseudo-random draws, so fewer simulations give the same accuracy.
+        # Sample sizes that are not a power of two lose Sobol's balance properties, but
+        # still beat pseudo-random draws by a wide margin, so scipy's warning is silenced.
+        sampler = qmc.Sobol(d=mean_prices.size, scramble=True, seed=self.rng)
+        with warnings.catch_warnings():
+            warnings.filterwarnings(
+                "ignore",
+                message="The balance properties of Sobol' points require n to be a power of 2",
+                category=UserWarning
+            )
+            u = sampler.random(self.num_simulations)
+        
+        # Keep away from 0 and 1, where the inverse normal CDF is infinite
+        u = np.clip(u, 1e-10, 1 - 1e-10)
+        draws = norm.ppf(u).astype(np.float32)
+        scenarios = mean_prices + std_devs * draws
+        return scenarios[:, 0] if scalar else scenarios
     
     def calculate_npv(self, cash_flows, discount_rate=None):
         """Calculate Net Present Value of cash flows"""
+        if discount_rate is None and len(cash_flows) == self.TIME_HORIZON:
+            return cash_flows @ self._discount_factors
         if discount_rate is None:
             discount_rate = self.DISCOUNT_RATE
         
@@ -28,43 +64,41 @@ class CarbonCreditSimulation:
         discount_factors = 1 / (1 + discount_rate) ** years
         return np.sum(cash_flows * discount_factors)
     
+    def calculate_p75(self, values):
+        """Calculate the 75th percentile as the upper nearest-rank element (no interpolation)"""
+        k = int(0.75 * len(values))
+        return np.partition(values, k)[k]
+    
     def simulate_conventional_use(self, timber_value, cattle_mean, cattle_std, 
                                 soy_mean, soy_std):
         """Simulate NPV of conventional land use (timber + agriculture)"""
-        # Generate annual revenues for cattle and soy
-        cattle_revenues = self.generate_price_scenarios(cattle_mean, cattle_std)
-        soy_revenues = self.generate_price_scenarios(soy_mean, soy_std)
+        # Generate annual revenues for cattle and soy in a single draw
+        revenues = self.generate_price_scenarios(
+            (cattle_mean, soy_mean), (cattle_std, soy_std)
+        )
+        cattle_revenues = revenues[:, 0]
+        soy_revenues = revenues[:, 1]
         
-        # Calculate NPV for each simulation
-        conventional_npvs = []
-        for i in range(self.num_simulations):
-            # Initialize cash flows
-            cash_flows = np.zeros(self.TIME_HORIZON)
-            
-            # Add timber revenue if applicable
-            if timber_value > 0:
-                cash_flows[0] = timber_value
-            
-            # Alternate between cattle and soy (simplified rotation)
-            for year in range(self.TIME_HORIZON):
-                if year % 2 == 0:
-                    cash_flows[year] += cattle_revenues[i]
-                else:
-                    cash_flows[year] += soy_revenues[i]
-            
-            npv = self.calculate_npv(cash_flows)
-            conventional_npvs.append(npv)
-            
-        return np.array(conventional_npvs)
-    
-    def find_equilibrium_carbon_prices(self, conventional_npvs):
-        """Find carbon credit prices that make conservation competitive"""
+        discount_factors = self._discount_factors.astype(np.float32)
+
+        # Cash flows are linear in the revenues, so each NPV only needs the sum of
+        # the discount factors for cattle (even) and soy (odd) years
+        cattle_factor = discount_factors[0::2].sum()
+        soy_factor = discount_factors[1::2].sum()
         
-        p75 = np.percentile(conventional_npvs, 75)
+        # Calculate NPV for each simulation (timber revenue only if applicable)
+        timber_npv = np.float32(max(timber_value, 0)) * discount_factors[0]
+        return timber_npv + cattle_revenues * cattle_factor + soy_revenues * soy_factor
+    
+    def find_equilibrium_carbon_prices(self, conventional_npvs, p75=None):
+        """Find carbon credit prices that make conservation competitive (as arrays)"""
+        if p75 is None:
+            p75 = self.calculate_p75(conventional_npvs)
         
-        years = np.arange(self.TIME_HORIZON)
-        discount_factors = 1 / (1 + self.DISCOUNT_RATE) ** years
-        pv_annuity_factor = np.sum(discount_factors[1:])
+        # The price grid is small, so keep it in double precision
+        p75 = np.float64(p75)
+        
+        pv_annuity_factor = np.sum(self._discount_factors[1:])
         pv_annuity_factor += 1 / (1 + self.DISCOUNT_RATE) ** self.TIME_HORIZON  # Add this line to include year 30
         
         stock_coefficient = self.CARBON_STOCK
@@ -72,24 +106,17 @@ class CarbonCreditSimulation:
         
         max_stock_price = (p75 * 1.5) / stock_coefficient
         stock_prices = np.linspace(0, max_stock_price, 200)
-        
-        equilibrium_prices = []
-        
-        for stock_price in stock_prices:
-            stock_contribution = stock_coefficient * stock_price
-            remaining_npv = p75 - stock_contribution
-            
-            if remaining_npv >= 0:
-                flow_price = remaining_npv / flow_coefficient
-                conservation_npv = stock_contribution + flow_coefficient * flow_price
-                
-                equilibrium_prices.append({
-                    'stock_price': stock_price,
-                    'flow_price': flow_price,
-                    'conservation_npv': conservation_npv
-                })
-        
-        return pd.DataFrame(equilibrium_prices)
+
+        # Evaluate every candidate stock price at once
+        stock_contributions = stock_coefficient * stock_prices
+        remaining_npvs = p75 - stock_contributions
+
+        # Keep only stock prices that do not exceed the target NPV on their own
+        viable = remaining_npvs >= 0
+        flow_prices = remaining_npvs[viable] / flow_coefficient
+        conservation_npvs = stock_contributions[viable] + flow_coefficient * flow_prices
+
+        return stock_prices[viable], flow_prices, conservation_npvs
     
     def run_simulation(self, timber_value, cattle_mean, cattle_std, 
                       soy_mean, soy_std):
@@ -99,26 +126,49 @@ class CarbonCreditSimulation:
             timber_value, cattle_mean, cattle_std, soy_mean, soy_std
         )
         
+        # Target NPV that conservation has to match, computed once
+        p75 = self.calculate_p75(conventional_npvs)
+        
         # Find equilibrium carbon credit prices
-        equilibrium_prices = self.find_equilibrium_carbon_prices(conventional_npvs)
+        stock_prices, flow_prices, conservation_npvs = self.find_equilibrium_carbon_prices(
+            conventional_npvs, p75
+        )
 
         # Escolher ponto onde Stock ≈ Flow (mais intuitivo)
-        price_diff = abs(equilibrium_prices['stock_price'] - 
-                        equilibrium_prices['flow_price'])
-        min_diff_idx = price_diff.idxmin()
+        min_diff_idx = np.argmin(np.abs(stock_prices - flow_prices))
 
         # Calculate summary statistics
         results = {
             'conventional_npv_mean': np.mean(conventional_npvs),
-            'conventional_npv_p75': np.percentile(conventional_npvs, 75),
-            'min_stock_price': equilibrium_prices['stock_price'].min(),
-            'min_flow_price': equilibrium_prices['flow_price'].min(),
-            'recommended_stock_price': equilibrium_prices.loc[min_diff_idx, 'stock_price'],
-            'recommended_flow_price': equilibrium_prices.loc[min_diff_idx, 'flow_price']
+            'conventional_npv_p75': p75,
+            'min_stock_price': stock_prices.min(),
+            'min_flow_price': flow_prices.min(),
+            'recommended_stock_price': stock_prices[min_diff_idx],
+            'recommended_flow_price': flow_prices[min_diff_idx]
         }
         
+        # Build the DataFrame only once, for display
+        equilibrium_prices = pd.DataFrame({
+            'stock_price': stock_prices,
+            'flow_price': flow_prices,
+            'conservation_npv': conservation_npvs
+        })
+        
         return results, equilibrium_prices, conventional_npvs
 
+@st.cache_data(show_spinner="Running simulation...", max_entries=32)
+def run_cached_simulation(num_simulations, discount_rate, time_horizon, timber_value,
+                          cattle_mean, cattle_std, soy_mean, soy_std):
+    """Run the simulation, reusing results for previously seen parameters"""
+    sim = CarbonCreditSimulation(
+        num_simulations=num_simulations,
+        discount_rate=discount_rate,
+        time_horizon=time_horizon
+    )
+    return sim.run_simulation(
+        timber_value, cattle_mean, cattle_std, soy_mean, soy_std
+    )
+
 def main():
     st.set_page_config(page_title="Carbon Credit Price Simulator", layout="wide")
     
@@ -130,156 +180,162 @@ def main():
     and soybean farming) in the Amazon rainforest.
     """)
     
-    # Currency selection
-    use_usd = st.toggle(
-        "Show values in US Dollars",
-        value=False,
-        help="Toggle between Brazilian Reais (R$) and US Dollars (US$)"
-    )
-    
-    exchange_rate = 6.00  # Default exchange rate
-    if use_usd:
+    # Group all inputs in a form so the simulation only reruns on submit. The currency
+    # settings belong here too: in US Dollars they set the revenue slider ranges and
+    # convert the slider values back to BRL.
+    with st.form("simulation_parameters"):
+        # Currency selection
+        use_usd = st.toggle(
+            "Show values in US Dollars",
+            value=False,
+            help="Toggle between Brazilian Reais (R$) and US Dollars (US$)"
+        )
+        
         exchange_rate = st.slider(
             "Exchange Rate (R$/US$)",
             min_value=1.00,
             max_value=10.00,
             value=5.50,
             step=0.05,
-            help="Exchange rate for converting Brazilian Reais to US Dollars"
+            help="Exchange rate for converting Brazilian Reais to US Dollars (used when values are shown in US Dollars)"
         )
-    
-    # Function to format currency values
-    def format_currency(value):
-        if use_usd:
-            return f"US$ {value/exchange_rate:,.2f}"
-        return f"R$ {value:,.2f}"
-    
-    st.divider()
-    
-    # Create three columns for financial inputs
-    st.subheader("Financial Parameters")
-    fin_col1, fin_col2 = st.columns(2)
-    
-    with fin_col1:
-        discount_rate = st.slider(
-            "Discount Rate (%)",
-            min_value=1.0,
-            max_value=20.0,
-            value=8.0,
-            step=0.5,
-            help="Annual discount rate used for NPV calculations"
-        ) / 100  # Convert percentage to decimal
+        st.caption("Only applies when US Dollars are selected at Run Simulation.")
         
-    with fin_col2:
-        time_horizon = st.slider(
-            "Time Horizon (Years)",
-            min_value=10,
-            max_value=50,
-            value=30,
-            step=5,
-            help="Number of years to consider in the analysis"
-        )
-    
-    st.divider()
-    
-    # Create two columns for conventional use inputs
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.subheader("Conventional Use Parameters")
+        # Multiplier from BRL (used in all calculations) to the display currency
+        display_scale = 1.0 / exchange_rate if use_usd else 1.0
         
-        include_timber = st.toggle(
-            "Include Timber Extraction",
-            value=False,
-            help="Toggle whether to include one-time timber revenue in the analysis"
-        )
+        # Function to format currency values
+        def format_currency(value):
+            if use_usd:
+                return f"US$ {value*display_scale:,.2f}"
+            return f"R$ {value:,.2f}"
+        
+        st.divider()
+        
+        # Create three columns for financial inputs
+        st.subheader("Financial Parameters")
+        fin_col1, fin_col2 = st.columns(2)
+        
+        with fin_col1:
+            discount_rate = st.slider(
+                "Discount Rate (%)",
+                min_value=1.0,
+                max_value=20.0,
+                value=8.0,
+                step=0.5,
+                help="Annual discount rate used for NPV calculations"
+            ) / 100  # Convert percentage to decimal
+            
+        with fin_col2:
+            time_horizon = st.slider(
+                "Time Horizon (Years)",
+                min_value=10,
+                max_value=50,
+                value=30,
+                step=5,
+                help="Number of years to consider in the analysis"
+            )
+        
+        st.divider()
         
-        timber_value = 0
-        if include_timber:
+        # Create two columns for conventional use inputs
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.subheader("Conventional Use Parameters")
+            
+            include_timber = st.toggle(
+                "Include Timber Extraction",
+                value=False,
+                help="Toggle whether to include one-time timber revenue in the analysis"
+            )
+            
+            # Always shown, since the form only applies the toggle on submit
             timber_value = st.slider(
                 f"Timber Value ({format_currency(1000)[0:3]}/hectare)",
                 min_value=1000 if not use_usd else 1000/exchange_rate,
                 max_value=10000 if not use_usd else 10000/exchange_rate,
                 value=4800 if not use_usd else 5000/exchange_rate,
                 step=100 if not use_usd else 100/exchange_rate,
-                help="One-time revenue from timber extraction"
+                help="One-time revenue from timber extraction, used when timber extraction is included"
             )
+            st.caption("Only applies when timber extraction is included at Run Simulation.")
             if use_usd:
                 timber_value *= exchange_rate  # Convert back to BRL for calculations
+            if not include_timber:
+                timber_value = 0
+            
+            cattle_mean = st.slider(
+                f"Average Cattle Revenue ({format_currency(1000)[0:3]}/hectare/year)",
+                min_value=200 if not use_usd else 200/exchange_rate,
+                max_value=2500 if not use_usd else 2000/exchange_rate,
+                value=1500 if not use_usd else 800/exchange_rate,
+                step=50 if not use_usd else 50/exchange_rate,
+                help="Mean annual revenue from cattle ranching"
+            )
+            if use_usd:
+                cattle_mean *= exchange_rate
+            
+            cattle_std = st.slider(
+                f"Cattle Revenue Std Dev ({format_currency(1000)[0:3]}/hectare/year)",
+                min_value=50 if not use_usd else 50/exchange_rate,
+                max_value=500 if not use_usd else 500/exchange_rate,
+                value=200 if not use_usd else 200/exchange_rate,
+                step=25 if not use_usd else 25/exchange_rate,
+                help="Standard deviation of annual cattle revenues"
+            )
+            if use_usd:
+                cattle_std *= exchange_rate
         
-        cattle_mean = st.slider(
-            f"Average Cattle Revenue ({format_currency(1000)[0:3]}/hectare/year)",
-            min_value=200 if not use_usd else 200/exchange_rate,
-            max_value=2500 if not use_usd else 2000/exchange_rate,
-            value=1500 if not use_usd else 800/exchange_rate,
-            step=50 if not use_usd else 50/exchange_rate,
-            help="Mean annual revenue from cattle ranching"
-        )
-        if use_usd:
-            cattle_mean *= exchange_rate
-        
-        cattle_std = st.slider(
-            f"Cattle Revenue Std Dev ({format_currency(1000)[0:3]}/hectare/year)",
-            min_value=50 if not use_usd else 50/exchange_rate,
-            max_value=500 if not use_usd else 500/exchange_rate,
-            value=200 if not use_usd else 200/exchange_rate,
-            step=25 if not use_usd else 25/exchange_rate,
-            help="Standard deviation of annual cattle revenues"
-        )
-        if use_usd:
-            cattle_std *= exchange_rate
-    
-    with col2:
-        soy_mean = st.slider(
-            f"Average Soybean Revenue ({format_currency(1000)[0:3]}/hectare/year)",
-            min_value=3000 if not use_usd else 500/exchange_rate,
-            max_value=10000 if not use_usd else 3000/exchange_rate,
-            value=6100 if not use_usd else 1200/exchange_rate,
-            step=50 if not use_usd else 50/exchange_rate,
-            help="Mean annual revenue from soybean farming"
-        )
-        if use_usd:
-            soy_mean *= exchange_rate
-        
-        soy_std = st.slider(
-            f"Soybean Revenue Std Dev ({format_currency(1000)[0:3]}/hectare/year)",
-            min_value=100 if not use_usd else 100/exchange_rate,
-            max_value=1000 if not use_usd else 1000/exchange_rate,
-            value=225 if not use_usd else 300/exchange_rate,
-            step=25 if not use_usd else 25/exchange_rate,
-            help="Standard deviation of annual soybean revenues"
-        )
-        if use_usd:
-            soy_std *= exchange_rate
+        with col2:
+            soy_mean = st.slider(
+                f"Average Soybean Revenue ({format_currency(1000)[0:3]}/hectare/year)",
+                min_value=3000 if not use_usd else 500/exchange_rate,
+                max_value=10000 if not use_usd else 3000/exchange_rate,
+                value=6100 if not use_usd else 1200/exchange_rate,
+                step=50 if not use_usd else 50/exchange_rate,
+                help="Mean annual revenue from soybean farming"
+            )
+            if use_usd:
+                soy_mean *= exchange_rate
+            
+            soy_std = st.slider(
+                f"Soybean Revenue Std Dev ({format_currency(1000)[0:3]}/hectare/year)",
+                min_value=100 if not use_usd else 100/exchange_rate,
+                max_value=1000 if not use_usd else 1000/exchange_rate,
+                value=225 if not use_usd else 300/exchange_rate,
+                step=25 if not use_usd else 25/exchange_rate,
+                help="Standard deviation of annual soybean revenues"
+            )
+            if use_usd:
+                soy_std *= exchange_rate
+            
+            num_simulations = st.slider(
+                "Number of Simulations",
+                min_value=1000,
+                max_value=200000,
+                value=10000,
+                step=1000,
+                help="More simulations increase accuracy but take longer. Quasi-Monte Carlo sampling keeps results stable even at lower counts"
+            )
         
-        num_simulations = st.slider(
-            "Number of Simulations",
-            min_value=1000,
-            max_value=200000,
-            value=10000,
-            step=1000,
-            help="More simulations increase accuracy but take longer"
-        )
+        st.form_submit_button("Run Simulation", type="primary")
     
-    # Initialize and run simulation
-    sim = CarbonCreditSimulation(
-        num_simulations=num_simulations,
-        discount_rate=discount_rate,
-        time_horizon=time_horizon
-    )
-    
-    results, equilibrium_prices, conventional_npvs = sim.run_simulation(
-        timber_value, cattle_mean, cattle_std, soy_mean, soy_std
+    # Run simulation (cached on its inputs, so reruns with unchanged inputs reuse the results)
+    results, equilibrium_prices, conventional_npvs = run_cached_simulation(
+        num_simulations, discount_rate, time_horizon, timber_value,
+        cattle_mean, cattle_std, soy_mean, soy_std
     )
     
     # Display results in cards
     st.subheader("Simulation Results")
     
     # Calculate annual equivalents using the discount rate
-    annual_factor = sim.DISCOUNT_RATE * (1 + sim.DISCOUNT_RATE) ** sim.TIME_HORIZON / ((1 + sim.DISCOUNT_RATE) ** sim.TIME_HORIZON - 1)
+    annual_factor = discount_rate * (1 + discount_rate) ** time_horizon / ((1 + discount_rate) ** time_horizon - 1)
     
     annual_stock_price = results['recommended_stock_price'] * annual_factor
     annual_flow_price = results['recommended_flow_price']  # Flow price is already annual
+    conventional_annual = results['conventional_npv_mean'] * annual_factor
     
     col1, col2, col3 = st.columns(3)
     
@@ -288,7 +344,7 @@ def main():
             label="Conventional Use NPV (Mean)",
             value=format_currency(results['conventional_npv_mean']) + "/ha",
             delta=(
-                f"{format_currency(results['conventional_npv_mean'] * discount_rate * (1 + discount_rate) ** time_horizon / ((1 + discount_rate) ** time_horizon - 1))}/ha-ano"),
+                f"{format_currency(conventional_annual)}/ha-ano"),
             delta_color="off",
             help="NPV of conventional use and Annualized equivalent over 30 years per ha "
             )
@@ -298,8 +354,8 @@ def main():
             label="Stock Credit Price (Total)",
             value=f"{format_currency(results['recommended_stock_price'])}/tCO2",
             delta=(
-                f"{format_currency(annual_stock_price*sim.CARBON_STOCK)}/ha-year, or\n"
-                f"{format_currency(results['recommended_stock_price']*sim.CARBON_STOCK)}/ha"
+                f"{format_currency(annual_stock_price*CarbonCreditSimulation.CARBON_STOCK)}/ha-year, or\n"
+                f"{format_currency(results['recommended_stock_price']*CarbonCreditSimulation.CARBON_STOCK)}/ha"
             ),
             help="Annualized equivalent over 30 years per tCO2-ha, per ha, and total per ha"
         )
@@ -309,8 +365,8 @@ def main():
             label="Flow Credit Price (Annual)",
             value=format_currency(annual_flow_price) + "/tCO2-year",
             delta=(
-                f"{format_currency(annual_flow_price*sim.ANNUAL_ABSORPTION)}/ha-year, or\n"
-                f"{format_currency((annual_flow_price*sim.ANNUAL_ABSORPTION) * (1 - (1 + discount_rate)**(-time_horizon)) / discount_rate)}/ha"
+                f"{format_currency(annual_flow_price*CarbonCreditSimulation.ANNUAL_ABSORPTION)}/ha-year, or\n"
+                f"{format_currency(annual_flow_price*CarbonCreditSimulation.ANNUAL_ABSORPTION / annual_factor)}/ha"
             ),
             help="Price for annually sequestered per tCO2-ha, and per ha"
         )
@@ -327,14 +383,23 @@ def main():
     st.subheader("Detailed Analysis")
     
     # Distribution of Conventional NPVs
+    # Bin on the server so only the bin counts are sent to the browser.
+    # Bins have equal width, so each NPV's bin index can be computed directly.
+    npvs_display = conventional_npvs * display_scale
+    num_bins = 50
+    npv_min = npvs_display.min()
+    bin_width = (npvs_display.max() - npv_min) / num_bins or 1.0
+    bin_idx = np.clip(((npvs_display - npv_min) / bin_width).astype(np.int64), 0, num_bins - 1)
+    counts = np.bincount(bin_idx, minlength=num_bins)
     fig1 = go.Figure()
-    fig1.add_trace(go.Histogram(
-        x=conventional_npvs if not use_usd else conventional_npvs/exchange_rate,
-        nbinsx=50,
+    fig1.add_trace(go.Bar(
+        x=npv_min + bin_width * (np.arange(num_bins) + 0.5),
+        y=counts,
+        width=bin_width,
         name="NPV Distribution"
     ))
     fig1.add_vline(
-        x=results['conventional_npv_p75'] if not use_usd else results['conventional_npv_p75']/exchange_rate,
+        x=results['conventional_npv_p75'] * display_scale,
         line_dash="dash",
         annotation_text="75th Percentile"
     )
@@ -348,14 +413,14 @@ def main():
     # Equilibrium Price Combinations
     fig2 = go.Figure()
     
-    # Add the main scatter plot
-    fig2.add_trace(go.Scatter(
-        x=equilibrium_prices['stock_price'] if not use_usd else equilibrium_prices['stock_price']/exchange_rate,
-        y=equilibrium_prices['flow_price'] if not use_usd else equilibrium_prices['flow_price']/exchange_rate,
+    # Add the main scatter plot (WebGL keeps large point counts responsive)
+    fig2.add_trace(go.Scattergl(
+        x=equilibrium_prices['stock_price'] * display_scale,
+        y=equilibrium_prices['flow_price'] * display_scale,
         mode='markers',
         marker=dict(
             size=8,
-            color=equilibrium_prices['conservation_npv'] if not use_usd else equilibrium_prices['conservation_npv']/exchange_rate,
+            color=equilibrium_prices['conservation_npv'] * display_scale,
             colorscale='Viridis',
             showscale=True,
             colorbar=dict(title=f"Conservation NPV ({currency_symbol}/ha)")
@@ -363,10 +428,10 @@ def main():
         name='Viable Combinations'
     ))
     
-    # Add recommended point
-    fig2.add_trace(go.Scatter(
-        x=[results['recommended_stock_price'] if not use_usd else results['recommended_stock_price']/exchange_rate],
-        y=[results['recommended_flow_price'] if not use_usd else results['recommended_flow_price']/exchange_rate],
+    # Add recommended point (also WebGL, so it is drawn above the main scatter)
+    fig2.add_trace(go.Scattergl(
+        x=[results['recommended_stock_price'] * display_scale],
+        y=[results['recommended_flow_price'] * display_scale],
         mode='markers',
         marker=dict(
             size=15,
@@ -416,10 +481,7 @@ def main():
     st.subheader("Financial Summary")
     
     # Calculate annual equivalent values
-    conservation_annual = annual_stock_price*sim.CARBON_STOCK + annual_flow_price*sim.ANNUAL_ABSORPTION
-    
-    conventional_annual = results['conventional_npv_mean'] * discount_rate * \
-                        (1 + discount_rate) ** time_horizon / ((1 + discount_rate) ** time_horizon - 1)
+    conservation_annual = annual_stock_price*CarbonCreditSimulation.CARBON_STOCK + annual_flow_price*CarbonCreditSimulation.ANNUAL_ABSORPTION
     
     summary_data = pd.DataFrame({
         'Metric': [
@@ -429,8 +491,8 @@ def main():
             f"Average Annual Conventional Revenue {'(inc. Timber)' if include_timber else '(excl. Timber)'}"
         ],
         'Value': [
-            format_currency(results['recommended_stock_price'] * sim.CARBON_STOCK),
-            format_currency(results['recommended_flow_price'] * sim.ANNUAL_ABSORPTION),
+            format_currency(results['recommended_stock_price'] * CarbonCreditSimulation.CARBON_STOCK),
+            format_currency(results['recommended_flow_price'] * CarbonCreditSimulation.ANNUAL_ABSORPTION),
             format_currency(conservation_annual),
             format_currency(conventional_annual)
         ]